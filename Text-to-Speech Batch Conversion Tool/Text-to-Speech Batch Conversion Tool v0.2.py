@@ -1,10 +1,16 @@
 import sys
 import os
+import asyncio
+import importlib
+import importlib.util
 import subprocess
 import threading
 import time
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from importlib import metadata
 
 # 抑制 libpng 警告
 os.environ['QT_LOGGING_RULES'] = '*.debug=false;qt.*.debug=false'
@@ -13,6 +19,78 @@ os.environ['QT_LOGGING_RULES'] = '*.debug=false;qt.*.debug=false'
 from PySide2 import QtWidgets, QtCore, QtGui
 
 
+def preload_edge_tts():
+    """预先导入 edge_tts，首次转换或测试时无需再等待模块加载"""
+    try:
+        import edge_tts  # noqa: F401
+    except ImportError:
+        # 未安装时由 check_edge_tts 提示安装
+        pass
+
+
+def installed_edge_tts_version():
+    """返回已安装的 edge-tts 版本，未安装时返回 None"""
+    try:
+        return metadata.version('edge-tts')
+    except metadata.PackageNotFoundError:
+        return None
+
+
+@lru_cache(maxsize=32)
+def compile_file_filter(file_filter):
+    """解析文件过滤器，返回 (是否匹配全部, 小写扩展名元组)"""
+    if file_filter == "*.*":
+        return True, ()
+    # 处理多个扩展名的情况
+    exts = tuple(f.strip().replace("*.", ".").lower()
+                 for f in file_filter.split(';') if "*." in f)
+    return False, exts
+
+
+def matches_filter(filename, match_all, exts):
+    """检查文件是否匹配 compile_file_filter 解析出的过滤器"""
+    return match_all or filename.lower().endswith(exts)
+
+
+def scan_files(folder_path):
+    """使用 os.scandir 遍历目录树，逐个返回 (所在目录, 文件名)"""
+    pending = [folder_path]
+    while pending:
+        dirpath = pending.pop()
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    # scandir 已缓存文件类型，无需额外 stat
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file():
+                        yield dirpath, entry.name
+        except OSError:
+            # 与 os.walk 一致，忽略无法访问的目录
+            continue
+
+
+# 转换生成的文件（含未完成的 .part），不作为源文件
+OUTPUT_SUFFIXES = ('.mp3', '.mp3.part')
+
+
+def iter_sources(folder_path, match_all, exts):
+    """遍历目录，逐个返回 (所在目录, 文件名, mp3 文件名, 冲突的源文件名)
+
+    多个文件会生成同一个 mp3 时（如 a.txt 与 a.md），后找到的文件返回先找到的文件名作为冲突，
+    否则冲突为 None。
+    """
+    targets = {}  # 输出路径 -> 源文件名
+    for dirpath, fn in scan_files(folder_path):
+        if not matches_filter(fn, match_all, exts) or fn.lower().endswith(OUTPUT_SUFFIXES):
+            continue
+
+        mp3_name = os.path.splitext(fn)[0] + '.mp3'
+        target = os.path.normcase(os.path.join(dirpath, mp3_name))
+        owner = targets.setdefault(target, fn)
+        yield dirpath, fn, mp3_name, (owner if owner != fn else None)
+
+
 class ConversionThread(QtCore.QThread):
     """转换线程，避免界面卡顿"""
     progress_signal = QtCore.Signal(str)
@@ -20,12 +98,22 @@ class ConversionThread(QtCore.QThread):
     finished_signal = QtCore.Signal()
     error_signal = QtCore.Signal(str)
 
-    def __init__(self, folder_path, voice, file_filter="*.txt"):
+    # 进程内缓存的 edge-tts 更新结果，避免重复执行 pip
+    _update_cache = None
+
+    def __init__(self, folder_path, voice, file_filter="*.txt", concurrency=16, check_update=False,
+                 overwrite=False):
         super().__init__()
         self.folder_path = folder_path
         self.voice = voice
         self.file_filter = file_filter
+        self._match_all, self._ext_tuple = compile_file_filter(file_filter)
+        self.concurrency = max(1, concurrency)
+        self.check_update = check_update
+        self.overwrite = overwrite
         self._is_running = True
+        self._loop = None
+        self._tasks = []
         self.total_files = 0
         self.processed_files = 0
 
@@ -33,143 +121,184 @@ class ConversionThread(QtCore.QThread):
         """执行转换任务"""
         try:
             # 自动更新 edge-tts
-            self.progress_signal.emit("正在检查并更新 edge-tts...")
-            update_msg = self.ensure_edge_tts_updated()
-            self.progress_signal.emit(update_msg)
-
-            # 首先统计符合条件的文件总数
-            self.total_files = 0
-            for (dirpath, dirnames, filenames) in os.walk(self.folder_path):
-                for fn in filenames:
-                    if self.matches_filter(fn):
-                        self.total_files += 1
+            if self.check_update:
+                self.progress_signal.emit("正在检查并更新 edge-tts...")
+                update_msg = self.ensure_edge_tts_updated()
+                self.progress_signal.emit(update_msg)
+
+            # 只遍历一次目录，收集符合条件的源文件及对应的 mp3 文件名
+            matches = []
+            for dirpath, fn, mp3_name, conflict in iter_sources(self.folder_path, self._match_all,
+                                                                self._ext_tuple):
+                if conflict:
+                    # 多个文件会生成同一个 mp3，只转换先找到的文件
+                    self.progress_signal.emit(f"⚠ 跳过(输出冲突): {fn} 与 {conflict} 都会生成 {mp3_name}")
+                    continue
+                matches.append((dirpath, fn, mp3_name))
+            self.total_files = len(matches)
 
             self.processed_files = 0
             self.progress_update.emit(0, self.total_files)
 
-            # 开始转换
-            for (dirpath, dirnames, filenames) in os.walk(self.folder_path):
-                if not self._is_running:
-                    break
+            # 开始转换 - 在同一个事件循环中并发完成所有文件，避免每个文件启动一次 edge-tts 进程
+            asyncio.run(self._convert_all(matches))
 
-                for fn in filenames:
-                    if not self._is_running:
-                        break
+        except Exception as e:
+            self.error_signal.emit(f"程序错误: {str(e)}")
+        finally:
+            self.finished_signal.emit()
 
-                    if self.matches_filter(fn):
-                        fpath = os.path.join(dirpath, fn)
-                        mp3Path = os.path.join(dirpath, fn.replace('.txt', '.mp3'))
+    async def _convert_all(self, matches):
+        """在进程内调用 edge_tts 并发转换所有文件"""
+        # 延迟导入，允许程序启动后再安装 edge-tts
+        import edge_tts
 
-                        # 记录进度
-                        self.progress_signal.emit(f"正在转换: {fn}")
+        # 限制同时进行的请求数量
+        sem = asyncio.Semaphore(self.concurrency)
 
-                        # 读取文件内容
-                        try:
-                            with open(fpath, 'r', encoding='utf-8') as f:
-                                content = f.read().strip()
-
-                            if not content:
-                                self.progress_signal.emit(f"⚠ 跳过空文件: {fn}")
-                                self.processed_files += 1
-                                self.progress_update.emit(self.processed_files, self.total_files)
-                                continue
-
-                            # 使用临时文件存储内容
-                            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False,
-                                                             encoding='utf-8') as tmp:
-                                tmp.write(content)
-                                tmp_path = tmp.name
-
-                            # 执行转换命令 - 使用文件方式更可靠
-                            cmd = [
-                                'edge-tts',
-                                '--voice', self.voice,
-                                '--file', tmp_path,
-                                '--write-media', mp3Path
-                            ]
-
-                            try:
-                                result = subprocess.run(
-                                    cmd,
-                                    capture_output=True,
-                                    text=True,
-                                    encoding='utf-8',
-                                    timeout=60  # 60秒超时
-                                )
-
-                                # 删除临时文件
-                                try:
-                                    os.unlink(tmp_path)
-                                except:
-                                    pass
-
-                                if result.returncode == 0:
-                                    self.progress_signal.emit(f"✓ 已转换: {fn} -> {fn.replace('.txt', '.mp3')}")
-                                else:
-                                    error_msg = result.stderr or result.stdout or "未知错误"
-                                    self.progress_signal.emit(f"✗ 转换失败: {fn} - {error_msg[:100]}")
-                            except subprocess.TimeoutExpired:
-                                self.progress_signal.emit(f"✗ 转换超时: {fn}")
-                            except Exception as e:
-                                self.progress_signal.emit(f"✗ 错误: {fn} - {str(e)}")
+        # 保存事件循环和任务，供 stop() 从界面线程取消正在进行的转换
+        self._loop = asyncio.get_running_loop()
 
+        # 文件读取放到线程池中执行，避免阻塞事件循环；线程数与 CPU 核心数一致
+        with ThreadPoolExecutor(max_workers=max(1, QtCore.QThread.idealThreadCount())) as executor:
+            self._tasks = [asyncio.ensure_future(self._convert_one(edge_tts, sem, executor, dirpath, fn, mp3_name))
+                           for dirpath, fn, mp3_name in matches]
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _convert_one(self, edge_tts, sem, executor, dirpath, fn, mp3_name):
+        """转换单个文件"""
+        async with sem:
+            if not self._is_running:
+                return
+
+            fpath = os.path.join(dirpath, fn)
+            mp3Path = os.path.join(dirpath, mp3_name)
+            loop = asyncio.get_running_loop()
+
+            try:
+                # mp3 已存在且不早于源文件时无需重新生成
+                if not self.overwrite and await loop.run_in_executor(executor, self.is_up_to_date,
+                                                                     fpath, mp3Path):
+                    self.progress_signal.emit(f"↷ 已跳过(已存在): {fn}")
+                else:
+                    # 记录进度
+                    self.progress_signal.emit(f"正在转换: {fn}")
+
+                    # 读取文件内容
+                    content = await loop.run_in_executor(executor, self.read_text, fpath)
+
+                    if not content:
+                        self.progress_signal.emit(f"⚠ 跳过空文件: {fn}")
+                    else:
+                        # 直接传入文本内容，无需临时文件
+                        # 先写入 .part 文件，成功后再改名，失败时不会留下看似已完成的 mp3
+                        part_path = mp3Path + '.part'
+                        try:
+                            communicate = edge_tts.Communicate(content, self.voice)
+                            await asyncio.wait_for(communicate.save(part_path), timeout=60)  # 60秒超时
+                            os.replace(part_path, mp3Path)
+                            self.progress_signal.emit(f"✓ 已转换: {fn} -> {mp3_name}")
+                        except asyncio.TimeoutError:
+                            self.progress_signal.emit(f"✗ 转换超时: {fn}")
                         except Exception as e:
-                            self.progress_signal.emit(f"✗ 读取文件失败: {fn} - {str(e)}")
+                            self.progress_signal.emit(f"✗ 转换失败: {fn} - {str(e)[:100]}")
+                        finally:
+                            self.remove_file(part_path)
 
-                        self.processed_files += 1
-                        self.progress_update.emit(self.processed_files, self.total_files)
+            except Exception as e:
+                self.progress_signal.emit(f"✗ 读取文件失败: {fn} - {str(e)}")
 
-        except Exception as e:
-            self.error_signal.emit(f"程序错误: {str(e)}")
-        finally:
-            self.finished_signal.emit()
+            # 所有任务运行在同一个事件循环线程中，计数无需加锁
+            self.processed_files += 1
+            self.progress_update.emit(self.processed_files, self.total_files)
+
+    @staticmethod
+    def is_up_to_date(fpath, mp3Path):
+        """检查 mp3 是否已存在、非空且不早于源文件"""
+        try:
+            mp3_stat = os.stat(mp3Path)
+        except OSError:
+            return False
+        # 空的 mp3 视为上次转换失败留下的文件
+        return mp3_stat.st_size > 0 and mp3_stat.st_mtime >= os.stat(fpath).st_mtime
+
+    @staticmethod
+    def remove_file(path):
+        """删除文件，文件不存在时忽略"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def read_text(fpath):
+        """读取文本文件内容，空文件返回空字符串"""
+        # 零字节文件无需打开
+        if os.path.getsize(fpath) == 0:
+            return ""
+
+        with open(fpath, 'r', encoding='utf-8', buffering=131072) as f:  # 128KB 缓冲，减少读系统调用
+            content = f.read()
+
+        # 只判断是否全为空白，避免 strip() 再复制一份内容
+        return "" if content.isspace() else content
 
     @staticmethod
     def ensure_edge_tts_updated():
-        """确保 edge-tts 是最新版本"""
+        """确保 edge-tts 是最新版本（每个进程只检查一次）"""
+        if ConversionThread._update_cache is not None:
+            return ConversionThread._update_cache
+
         try:
-            # 尝试更新 edge-tts
+            old_version = installed_edge_tts_version()
+
+            # 尝试更新 edge-tts，跳过 pip 自身的版本检查并只使用预编译包
             result = subprocess.run(
-                [sys.executable, '-m', 'pip', 'install', '--upgrade', 'edge-tts'],
+                [sys.executable, '-m', 'pip', 'install', '--upgrade',
+                 '--disable-pip-version-check', '-q', '--only-binary=:all:', 'edge-tts'],
                 capture_output=True,
                 text=True,
                 encoding='utf-8',
                 timeout=120  # 给更新过程更多时间
             )
             if result.returncode == 0:
-                # 检查输出中是否包含 "Requirement already satisfied"，这表示已是最新版
-                if "Requirement already satisfied" in result.stdout:
-                    return "edge-tts 已是最新版本。"
+                # 安静模式下没有 "Requirement already satisfied" 输出，改为比较版本号
+                if installed_edge_tts_version() == old_version:
+                    msg = "edge-tts 已是最新版本。"
+                elif 'edge_tts' in sys.modules:
+                    # 已导入的旧版本模块不会被替换，新版本需重启程序后才会使用
+                    msg = "edge-tts 已成功更新，重启程序后生效。"
                 else:
-                    return "edge-tts 已成功更新。"
+                    msg = "edge-tts 已成功更新。"
             else:
                 # 如果更新失败，返回错误信息
-                return f"尝试更新 edge-tts 时出错，但不影响后续转换: {result.stderr[:100]}"
+                msg = f"尝试更新 edge-tts 时出错，但不影响后续转换: {result.stderr[:100]}"
         except subprocess.TimeoutExpired:
-            return "更新 edge-tts 超时，但不影响后续转换。"
+            msg = "更新 edge-tts 超时，但不影响后续转换。"
         except Exception as e:
-            return f"检查更新时发生错误，但不影响后续转换: {str(e)}"
+            msg = f"检查更新时发生错误，但不影响后续转换: {str(e)}"
 
-    def matches_filter(self, filename):
-        """检查文件是否匹配过滤器"""
-        if self.file_filter == "*.*":
-            return True
-        elif "*." in self.file_filter:
-            # 处理多个扩展名的情况
-            filters = [f.strip() for f in self.file_filter.split(';')]
-            for filter_ext in filters:
-                if "*." in filter_ext:
-                    ext = filter_ext.replace("*.", ".")
-                    if filename.endswith(ext):
-                        return True
-            return False
-        else:
-            return False
+        ConversionThread._update_cache = msg
+        return msg
 
     def stop(self):
         """停止转换"""
         self._is_running = False
 
+        # 取消正在进行的转换，未完成的 .part 文件由 _convert_one 清理
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._cancel_tasks)
+            except RuntimeError:
+                # 事件循环已关闭，转换已经结束
+                pass
+
+    def _cancel_tasks(self):
+        """在事件循环线程中取消所有转换任务"""
+        for task in self._tasks:
+            task.cancel()
+
 
 class TestThread(QtCore.QThread):
     """测试语音线程"""
@@ -184,79 +313,71 @@ class TestThread(QtCore.QThread):
     def run(self):
         """执行测试"""
         try:
-            # 自动更新 edge-tts
-            self.progress_signal.emit("正在检查并更新 edge-tts...")
-            update_msg = ConversionThread.ensure_edge_tts_updated()
-            self.progress_signal.emit(update_msg)
-
             # 创建临时文件
             test_file = os.path.join(tempfile.gettempdir(),
                                      f"test_voice_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp3")
 
-            # 创建临时文本文件
-            temp_text_file = os.path.join(tempfile.gettempdir(),
-                                          f"test_text_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
-
             try:
-                # 将文本写入临时文件
-                with open(temp_text_file, 'w', encoding='utf-8') as f:
-                    f.write(self.text)
-
                 self.progress_signal.emit("正在生成测试音频...")
 
-                # 使用列表形式传递参数，避免shell解析问题
-                cmd = [
-                    'edge-tts',
-                    '--voice', self.voice,
-                    '--file', temp_text_file,
-                    '--write-media', test_file
-                ]
-
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    encoding='utf-8',
-                    timeout=30  # 添加超时
-                )
-
-                # 清理临时文本文件
-                try:
-                    os.remove(temp_text_file)
-                except:
-                    pass
-
-                if result.returncode == 0:
-                    if os.path.exists(test_file) and os.path.getsize(test_file) > 0:
-                        self.progress_signal.emit("测试音频生成成功，正在播放...")
-
-                        # 播放音频
-                        if sys.platform == "win32":
-                            # Windows: 使用start命令更可靠
-                            subprocess.Popen(['start', '', test_file], shell=True)
-                        elif sys.platform == "darwin":  # macOS
-                            subprocess.Popen(["afplay", test_file])
-                        else:  # Linux
-                            subprocess.Popen(["xdg-open", test_file])
-
-                        self.finished_signal.emit(f"✓ 测试音频已生成并播放: {os.path.basename(test_file)}", True)
-                    else:
-                        self.finished_signal.emit("✗ 测试音频文件生成失败或为空", False)
+                # 直接传入测试文本，无需临时文本文件
+                asyncio.run(self._synthesize(test_file))
+
+                if os.path.exists(test_file) and os.path.getsize(test_file) > 0:
+                    self.progress_signal.emit("测试音频生成成功，正在播放...")
+
+                    # 播放音频
+                    if sys.platform == "win32":
+                        # Windows: 直接调用默认播放器，无需启动 cmd.exe
+                        os.startfile(test_file)
+                    elif sys.platform == "darwin":  # macOS
+                        subprocess.Popen(["afplay", test_file])
+                    else:  # Linux
+                        subprocess.Popen(["xdg-open", test_file])
+
+                    self.finished_signal.emit(f"✓ 测试音频已生成并播放: {os.path.basename(test_file)}", True)
                 else:
-                    error_msg = result.stderr or result.stdout or "未知错误"
-                    self.finished_signal.emit(f"✗ 测试失败: {error_msg[:200]}", False)
+                    self.finished_signal.emit("✗ 测试音频文件生成失败或为空", False)
 
+            except asyncio.TimeoutError:
+                self.finished_signal.emit("✗ 测试超时", False)
             except Exception as e:
-                # 清理临时文件
-                try:
-                    os.remove(temp_text_file)
-                except:
-                    pass
-                self.finished_signal.emit(f"✗ 测试过程出错: {str(e)}", False)
+                self.finished_signal.emit(f"✗ 测试失败: {str(e)[:200]}", False)
 
         except Exception as e:
             self.finished_signal.emit(f"✗ 测试错误: {str(e)}", False)
 
+    async def _synthesize(self, output_path):
+        """在进程内调用 edge_tts 生成测试音频"""
+        # 延迟导入，允许程序启动后再安装 edge-tts
+        import edge_tts
+
+        communicate = edge_tts.Communicate(self.text, self.voice)
+        await asyncio.wait_for(communicate.save(output_path), timeout=30)  # 添加超时
+
+
+class FileCountThread(QtCore.QThread):
+    """统计文件线程，避免遍历大目录时界面卡顿"""
+    count_ready = QtCore.Signal(int, int)  # 请求编号, 文件数量
+
+    def __init__(self, folder_path, file_filter, request_id, parent=None):
+        super().__init__(parent)
+        self.folder_path = folder_path
+        self.request_id = request_id
+        self._match_all, self._ext_tuple = compile_file_filter(file_filter)
+
+    def run(self):
+        """执行统计"""
+        # 与 ConversionThread 使用相同的规则，统计结果与转换时的文件总数一致
+        file_count = 0
+        for _, _, _, conflict in iter_sources(self.folder_path, self._match_all, self._ext_tuple):
+            # 已选择其他目录或窗口关闭时提前结束
+            if self.isInterruptionRequested():
+                return
+            if not conflict:
+                file_count += 1
+        self.count_ready.emit(self.request_id, file_count)
+
 
 class ProgressEstimator:
     """进度估计器"""
@@ -271,8 +392,8 @@ class ProgressEstimator:
         self.total_files = total_files
         self.completed_files = 0
 
-    def update(self):
-        self.completed_files += 1
+    def update(self, completed_files):
+        self.completed_files = completed_files
         if self.completed_files > 0 and self.start_time:
             elapsed = time.time() - self.start_time
             if self.completed_files > 0:
@@ -298,9 +419,20 @@ class Window(QtWidgets.QWidget):
         super().__init__()
         self.conversion_thread = None
         self.test_thread = None
+        self._count_request_id = 0
+        self._edge_tts_checked = False
         self.progress_estimator = ProgressEstimator()
         self.setup_ui()
 
+        # 日志和进度先缓存，由定时器批量刷新到界面，避免每个信号都触发重绘
+        self._log_buffer = []
+        self._latest_progress = None
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.setInterval(100)
+        self._refresh_timer.timeout.connect(self._flush_log)
+        self._refresh_timer.timeout.connect(self._flush_progress)
+        self._refresh_timer.start()
+
     def setup_ui(self):
         """设置界面"""
         self.setWindowTitle("文本转语音批量转换工具 v2.0")
@@ -335,18 +467,40 @@ class Window(QtWidgets.QWidget):
 
         # 语音选择
         self.voice_combo = QtWidgets.QComboBox(self)
-        self.voice_combo.addItems([
-            "zh-CN-YunjianNeural (云健)",
-            "zh-CN-XiaoxiaoNeural (晓晓)",
-            "zh-CN-XiaoyiNeural (晓伊)",
-            "zh-CN-YunxiNeural (云希)",
-            "zh-CN-YunxiaNeural (云夏)",
-            "zh-CN-YunyangNeural (云扬)",
-            "en-US-JennyNeural (英文-Jenny)",
-            "en-US-GuyNeural (英文-Guy)"
-        ])
+        # 语音代码保存在 userData 中，使用时无需解析显示文本
+        for code, label in [
+            ("zh-CN-YunjianNeural", "云健"),
+            ("zh-CN-XiaoxiaoNeural", "晓晓"),
+            ("zh-CN-XiaoyiNeural", "晓伊"),
+            ("zh-CN-YunxiNeural", "云希"),
+            ("zh-CN-YunxiaNeural", "云夏"),
+            ("zh-CN-YunyangNeural", "云扬"),
+            ("en-US-JennyNeural", "英文-Jenny"),
+            ("en-US-GuyNeural", "英文-Guy")
+        ]:
+            self.voice_combo.addItem(f"{code} ({label})", code)
         self.voice_combo.setFixedHeight(30)
 
+        # 并发数
+        concurrency_layout = QtWidgets.QHBoxLayout()
+        concurrency_layout.addWidget(QtWidgets.QLabel("并发数:"))
+        self.concurrency_spin = QtWidgets.QSpinBox(self)
+        self.concurrency_spin.setRange(1, 32)
+        self.concurrency_spin.setValue(16)
+        self.concurrency_spin.setToolTip("同时进行转换的文件数量")
+        self.concurrency_spin.setFixedHeight(30)
+        concurrency_layout.addWidget(self.concurrency_spin)
+
+        # 检查更新
+        self.check_update_box = QtWidgets.QCheckBox("检查更新", self)
+        self.check_update_box.setToolTip("开始转换前检查并更新 edge-tts（每次运行程序只检查一次）")
+        self.check_update_box.setChecked(False)
+
+        # 覆盖已存在
+        self.overwrite_box = QtWidgets.QCheckBox("覆盖已存在", self)
+        self.overwrite_box.setToolTip("不勾选时跳过已存在且比文本文件新的 mp3")
+        self.overwrite_box.setChecked(False)
+
         # 测试按钮
         self.btn_test = QtWidgets.QPushButton('测试语音', self)
         self.btn_test.setFixedSize(80, 30)
@@ -431,6 +585,10 @@ class Window(QtWidgets.QWidget):
                 border-radius: 3px;
             }
         """)
+        # 日志只追加不编辑：关闭撤销栈并限制行数，内存占用不随文件数增长
+        self.textEdit.setUndoRedoEnabled(False)
+        self.textEdit.setMaximumBlockCount(2000)
+        self.textEdit.setCenterOnScroll(False)
 
         # 创建布局 - 顶部工具栏
         top_layout = QtWidgets.QHBoxLayout()
@@ -440,6 +598,9 @@ class Window(QtWidgets.QWidget):
         # 工具栏第二行
         toolbar_layout = QtWidgets.QHBoxLayout()
         toolbar_layout.addLayout(filter_layout)
+        toolbar_layout.addLayout(concurrency_layout)
+        toolbar_layout.addWidget(self.check_update_box)
+        toolbar_layout.addWidget(self.overwrite_box)
         toolbar_layout.addWidget(self.voice_combo)
         toolbar_layout.addWidget(self.btn_test)
         toolbar_layout.addWidget(self.btn_run)
@@ -485,35 +646,34 @@ class Window(QtWidgets.QWidget):
             if not file_filter:
                 file_filter = "*.txt"
 
-            file_count = 0
-            for (dirpath, dirnames, filenames) in os.walk(folder_path):
-                for fn in filenames:
-                    if self.matches_filter(fn, file_filter):
-                        file_count += 1
-
-            self.progress_label.setText(f"找到 {file_count} 个符合条件的文件")
+            self.progress_label.setText("正在统计文件...")
             self.progress_bar.setVisible(False)
             self.time_label.clear()
+            self._log_buffer.clear()
             self.textEdit.clear()
             self.textEdit.appendPlainText(f"已选择目录: {folder_path}")
             self.textEdit.appendPlainText(f"文件筛选: {file_filter}")
-            self.textEdit.appendPlainText(f"发现 {file_count} 个符合条件的文件\n")
 
-    def matches_filter(self, filename, file_filter):
-        """检查文件是否匹配过滤器"""
-        if file_filter == "*.*":
-            return True
-        elif "*." in file_filter:
-            # 处理多个扩展名的情况
-            filters = [f.strip() for f in file_filter.split(';')]
-            for filter_ext in filters:
-                if "*." in filter_ext:
-                    ext = filter_ext.replace("*.", ".")
-                    if filename.endswith(ext):
-                        return True
-            return False
-        else:
-            return False
+            # 在后台线程中统计，编号用于丢弃过期目录的结果
+            self.stop_file_count()
+            count_thread = FileCountThread(folder_path, file_filter, self._count_request_id, self)
+            count_thread.count_ready.connect(self.file_count_ready)
+            count_thread.finished.connect(count_thread.deleteLater)
+            count_thread.start()
+
+    def stop_file_count(self):
+        """使正在进行的文件统计失效并请求其停止"""
+        self._count_request_id += 1
+        for count_thread in self.findChildren(FileCountThread):
+            count_thread.requestInterruption()
+
+    def file_count_ready(self, request_id, file_count):
+        """文件统计完成"""
+        if request_id != self._count_request_id:
+            return
+
+        self.progress_label.setText(f"找到 {file_count} 个符合条件的文件")
+        self.textEdit.appendPlainText(f"发现 {file_count} 个符合条件的文件\n")
 
     def start_conversion(self):
         """开始转换"""
@@ -526,11 +686,14 @@ class Window(QtWidgets.QWidget):
             return
 
         # 获取选中的语音
-        selected_voice = self.voice_combo.currentText().split(' ')[0]
+        selected_voice = self.voice_combo.currentData()
         file_filter = self.file_filter.text().strip()
         if not file_filter:
             file_filter = "*.txt"
 
+        # 开始转换后不再显示目录统计结果
+        self.stop_file_count()
+
         # 禁用开始按钮，启用停止按钮
         self.btn_run.setEnabled(False)
         self.btn_test.setEnabled(False)
@@ -539,6 +702,7 @@ class Window(QtWidgets.QWidget):
         self.progress_label.setText("正在转换中...")
 
         # 清空之前的输出
+        self._log_buffer.clear()
         self.textEdit.clear()
         self.textEdit.appendPlainText(f"开始批量转换...\n")
         self.textEdit.appendPlainText(f"语音: {self.voice_combo.currentText()}\n")
@@ -546,16 +710,16 @@ class Window(QtWidgets.QWidget):
         self.textEdit.appendPlainText("=" * 50 + "\n")
 
         # 创建并启动转换线程
-        self.conversion_thread = ConversionThread(self.folderPath, selected_voice, file_filter)
-        self.conversion_thread.progress_signal.connect(self.update_progress)
-        self.conversion_thread.progress_update.connect(self.update_progress_bar)
+        self.conversion_thread = ConversionThread(self.folderPath, selected_voice, file_filter,
+                                                  self.concurrency_spin.value(),
+                                                  self.check_update_box.isChecked(),
+                                                  self.overwrite_box.isChecked())
+        self.conversion_thread.progress_signal.connect(self.update_progress, QtCore.Qt.QueuedConnection)
+        self.conversion_thread.progress_update.connect(self.update_progress_bar, QtCore.Qt.QueuedConnection)
         self.conversion_thread.finished_signal.connect(self.conversion_finished)
         self.conversion_thread.error_signal.connect(self.show_error)
         self.conversion_thread.start()
 
-        # 初始化进度估计器
-        self.progress_estimator.start(self.conversion_thread.total_files)
-
     def stop_conversion(self):
         """停止转换"""
         if self.conversion_thread and self.conversion_thread.isRunning():
@@ -570,35 +734,60 @@ class Window(QtWidgets.QWidget):
                 self.conversion_thread.stop()
                 self.conversion_thread.wait()
                 self.progress_label.setText("已停止")
+                self._flush_progress()
                 self.time_label.clear()
+                self._flush_log()
                 self.textEdit.appendPlainText("\n转换已停止")
 
     def update_progress(self, message):
         """更新进度显示"""
-        self.textEdit.appendPlainText(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+        # 只写入缓冲区，由定时器统一刷新
+        self._log_buffer.append(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+
+    def _flush_log(self):
+        """将缓冲的日志一次性写入文本框"""
+        if not self._log_buffer:
+            return
+        self.textEdit.appendPlainText('\n'.join(self._log_buffer))
+        self._log_buffer.clear()
 
         # 滚动到底部
         scrollbar = self.textEdit.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
 
-        # 更新进度估计器
-        if "正在转换" in message:
-            self.time_label.setText(self.progress_estimator.update())
-
     def update_progress_bar(self, current, total):
         """更新进度条"""
+        # 线程完成更新检查和目录统计后才上报 (0, 总数)，此时再开始计时
+        if current == 0:
+            self.progress_estimator.start(total)
+
+        # 只保留最新进度，由定时器统一刷新
+        self._latest_progress = (current, total)
+
+    def _flush_progress(self):
+        """将最新进度写入进度条"""
+        if self._latest_progress is None:
+            return
+        current, total = self._latest_progress
+        self._latest_progress = None
+
         if total > 0:
             progress = int((current / total) * 100)
             self.progress_bar.setValue(progress)
             self.progress_bar.setFormat(f"{current}/{total} ({progress}%)")
 
+            # 按已完成的文件数（含跳过的文件）估计剩余时间，并发时开始的文件数不代表进度
+            self.time_label.setText(self.progress_estimator.update(current))
+
     def conversion_finished(self):
         """转换完成"""
         self.btn_run.setEnabled(True)
         self.btn_test.setEnabled(True)
         self.btn_stop.setEnabled(False)
         self.progress_label.setText("转换完成")
+        self._flush_progress()
         self.time_label.clear()
+        self._flush_log()
         self.textEdit.appendPlainText("\n" + "=" * 50)
         self.textEdit.appendPlainText("所有文件转换完成！")
 
@@ -608,7 +797,7 @@ class Window(QtWidgets.QWidget):
     def test_voice(self):
         """测试语音效果"""
         # 获取选中的语音
-        selected_voice = self.voice_combo.currentText().split(' ')[0]
+        selected_voice = self.voice_combo.currentData()
 
         # 先检查 edge-tts 是否可用
         if not self.check_edge_tts():
@@ -637,17 +826,22 @@ class Window(QtWidgets.QWidget):
         """测试完成"""
         self.btn_test.setEnabled(True)
         self.progress_label.setText("测试完成" if success else "测试失败")
+        self._flush_log()
         self.textEdit.appendPlainText(f"[测试] {message}")
 
     def check_edge_tts(self):
         """检查 edge-tts 是否可用"""
+        # 本次运行已检查通过则不再重复检查
+        if self._edge_tts_checked:
+            return True
+
         try:
-            # 尝试运行 edge-tts --version
-            result = subprocess.run(['edge-tts', '--version'],
-                                    capture_output=True, text=True, timeout=5)
-            if result.returncode != 0:
+            # 转换和测试都在进程内导入 edge_tts，因此检查当前 Python 环境能否导入该模块
+            # 先清除导入缓存，使程序运行期间安装的 edge-tts 也能被找到
+            importlib.invalidate_caches()
+            if importlib.util.find_spec('edge_tts') is None:
                 reply = QtWidgets.QMessageBox.warning(self, "警告",
-                                                      "edge-tts 可能未正确安装或不在系统PATH中。\n是否尝试自动安装？",
+                                                      "当前 Python 环境中未找到 edge-tts。\n是否尝试自动安装？",
                                                       QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
                                                       QtWidgets.QMessageBox.Yes)
 
@@ -660,6 +854,7 @@ class Window(QtWidgets.QWidget):
                     except Exception as e:
                         self.textEdit.appendPlainText(f"[系统] 安装失败: {str(e)}")
                 return False
+            self._edge_tts_checked = True
             return True
         except Exception as e:
             QtWidgets.QMessageBox.warning(self, "警告",
@@ -668,11 +863,15 @@ class Window(QtWidgets.QWidget):
 
     def show_error(self, error_msg):
         """显示错误信息"""
+        self._flush_log()
         self.textEdit.appendPlainText(f"\n✗ 错误: {error_msg}")
         QtWidgets.QMessageBox.critical(self, "错误", error_msg)
 
     def closeEvent(self, event):
         """关闭窗口时停止线程"""
+        self.stop_file_count()
+        for count_thread in self.findChildren(FileCountThread):
+            count_thread.wait()
         if self.conversion_thread and self.conversion_thread.isRunning():
             self.conversion_thread.stop()
             self.conversion_thread.wait()
@@ -680,6 +879,9 @@ class Window(QtWidgets.QWidget):
 
 
 def main():
+    # 在后台加载 edge_tts，与界面初始化并行
+    threading.Thread(target=preload_edge_tts, daemon=True).start()
+
     app = QtWidgets.QApplication([])
     app.setStyle('Fusion')  # 使用Fusion样式，更现代
 